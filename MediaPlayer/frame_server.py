@@ -0,0 +1,493 @@
+import os
+import sys
+import time
+import struct
+import tempfile
+import platform
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import Listener, Client
+import numpy as np
+
+# Shared memory layout
+#
+#   [global header, 64 bytes][slot 0 header, 64 bytes][slot 0 data] ... [slot N-1 ...]
+#
+# The global header holds the ring geometry, the number of frames published so
+# far ("head") and a flag the server sets when it shuts down. Each slot header
+# holds a sequence counter followed by the frame metadata. The writer bumps the
+# sequence to an odd value before touching a slot and to the next even value once
+# it is done, so readers can detect a frame that was overwritten while they were
+# looking at it.
+MAGIC = b"MMCF"
+VERSION = 1
+HEADER_SIZE = 64
+GLOBAL_HEADER = struct.Struct("<4sIIQ")    # magic, version, slot_count, slot_bytes
+SLOT_META = struct.Struct("<qdIII8s")      # frame_index, pts, height, width, channels, dtype
+HEAD_OFFSET = 32                           # uint64 frame counter inside the global header
+CLOSED_OFFSET = 40                         # uint64 set to 1 once the server has closed the ring
+SEQ_OFFSET = 0                             # uint64 sequence counter inside a slot header
+META_OFFSET = 8
+
+DEFAULT_NAME = "mmc_frames"
+DEFAULT_SLOTS = 8
+
+
+def control_address(name):
+    """Return the local control socket address for a frame server name"""
+    if platform.system() == 'Windows':
+        return rf"\\.\pipe\{name}"
+    return os.path.join(tempfile.gettempdir(), f"{name}.sock")
+
+
+def _align(size, alignment=HEADER_SIZE):
+    return (size + alignment - 1) // alignment * alignment
+
+
+# Guards the resource tracker patch in _attach_shared_memory
+_attach_lock = threading.Lock()
+
+
+def _attach_shared_memory(shm_name):
+    """Attach to an existing segment without letting this process unlink it on exit
+
+    Before Python 3.13 this briefly replaces `resource_tracker.register` for the
+    whole process. Attaches and FrameServer segments are serialised against it,
+    but a segment created by other code on another thread during that window
+    won't be registered with the tracker, so it won't be cleaned up if that
+    process dies without unlinking it.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=shm_name, track=False)
+    # Older versions register every attach with the resource tracker, which then
+    # unlinks the segment when the client exits. Unregistering afterwards isn't
+    # enough when the tracker is shared with the server (forked consumers), so
+    # skip the registration altogether.
+    from multiprocessing import resource_tracker
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=shm_name)
+        finally:
+            resource_tracker.register = register
+
+
+class _FrameRing:
+    """NumPy views over the shared memory ring, used by both server and clients"""
+
+    def __init__(self, shm, slot_count, slot_bytes):
+        self.shm = shm
+        self.slot_count = slot_count
+        self.slot_bytes = slot_bytes
+        self.slot_stride = HEADER_SIZE + _align(slot_bytes)
+
+        buf = shm.buf
+        self.head = np.ndarray((1,), dtype=np.uint64, buffer=buf, offset=HEAD_OFFSET)
+        self.closed = np.ndarray((1,), dtype=np.uint64, buffer=buf, offset=CLOSED_OFFSET)
+        self.seqs = []
+        self.metas = []
+        self.data = []
+        for i in range(slot_count):
+            base = HEADER_SIZE + i * self.slot_stride
+            self.seqs.append(np.ndarray((1,), dtype=np.uint64, buffer=buf, offset=base + SEQ_OFFSET))
+            self.metas.append(buf[base + META_OFFSET:base + META_OFFSET + SLOT_META.size])
+            self.data.append(np.ndarray((slot_bytes,), dtype=np.uint8, buffer=buf, offset=base + HEADER_SIZE))
+
+    @staticmethod
+    def total_size(slot_count, slot_bytes):
+        return HEADER_SIZE + slot_count * (HEADER_SIZE + _align(slot_bytes))
+
+    def release(self):
+        # Views must be dropped before the segment can be closed
+        self.head = None
+        self.closed = None
+        self.seqs = []
+        self.metas = []
+        self.data = []
+
+
+class FrameServerClosed(Exception):
+    """The server closed its ring (playback stopped or a new file was opened)
+
+    Subscribe again with a new FrameClient to follow the next ring.
+    """
+
+
+class Frame:
+    """A zero-copy view of one published frame
+
+    The pixels live in shared memory and are overwritten once the writer laps the
+    ring, so copy them (or check valid() after processing) if they must outlive
+    the next few frames.
+    """
+
+    def __init__(self, ring, slot, seq, frame_index, pts, array):
+        self._ring = ring
+        self.slot = slot
+        self.seq = seq
+        self.frame_index = frame_index
+        self.pts = pts
+        self.array = array
+
+    def valid(self):
+        """True while the slot still holds this frame"""
+        return bool(self._ring.seqs) and int(self._ring.seqs[self.slot][0]) == self.seq
+
+
+class FrameServer:
+    """Publishes decoded frames into a named shared memory ring
+
+    publish() only copies into shared memory and never waits on subscribers; slow
+    consumers simply fall behind and skip frames. A local control socket hands out
+    the ring layout to clients that want to subscribe.
+    """
+
+    def __init__(self, frame_shape, dtype=np.uint8, slot_count=DEFAULT_SLOTS, name=DEFAULT_NAME):
+        self.name = name
+        self.slot_count = slot_count
+        self.slot_bytes = int(np.prod(frame_shape)) * np.dtype(dtype).itemsize
+        self.frames_published = 0
+        self.frames_skipped = 0
+        self.subscribers = 0
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._closed = False
+
+        # Claim the control socket first, so a name clash fails before any memory is allocated
+        self.address = control_address(name)
+        self.listener = self._listen(self.address)
+
+        size = _FrameRing.total_size(slot_count, self.slot_bytes)
+        try:
+            # Don't create while a client on another thread has registration patched out
+            with _attach_lock:
+                self.shm = shared_memory.SharedMemory(create=True, size=size)
+        except Exception:
+            self.listener.close()
+            raise
+        GLOBAL_HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, slot_count, self.slot_bytes)
+        self.ring = _FrameRing(self.shm, slot_count, self.slot_bytes)
+        self.ring.head[0] = 0
+        self.ring.closed[0] = 0
+
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        print(f"Frame server '{name}' publishing to {self.shm.name} ({slot_count} slots of {self.slot_bytes} bytes)")
+
+    @staticmethod
+    def _listen(address):
+        """Bind the control socket, refusing to take over one that another server is using"""
+        try:
+            Client(address).close()
+        except OSError:
+            # Nobody answers: the path is free, or left behind by a server that crashed
+            if platform.system() != 'Windows' and os.path.exists(address):
+                os.unlink(address)
+        else:
+            raise RuntimeError(f"A frame server is already running at {address}")
+        return Listener(address)
+
+    def layout(self):
+        return {
+            "shm_name": self.shm.name,
+            "slot_count": self.slot_count,
+            "slot_bytes": self.slot_bytes,
+        }
+
+    def publish(self, frame, frame_index, pts):
+        """Copy a frame into the next slot of the ring"""
+        if frame.nbytes > self.slot_bytes:
+            # Frame doesn't fit the ring (e.g. stream changed resolution)
+            self.frames_skipped += 1
+            return False
+
+        frame = np.ascontiguousarray(frame)
+        with self._publish_lock:
+            if self._closed:
+                return False
+            self._write_slot(frame, frame_index, pts)
+        self.frames_published += 1
+        return True
+
+    def _write_slot(self, frame, frame_index, pts):
+        head = int(self.ring.head[0])
+        slot = head % self.slot_count
+        seq = self.ring.seqs[slot]
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 0
+
+        seq[0] += 1    # odd: slot is being written
+        SLOT_META.pack_into(self.ring.metas[slot], 0, frame_index, pts, height, width, channels,
+                            frame.dtype.str.encode())
+        self.ring.data[slot][:frame.nbytes] = frame.reshape(-1).view(np.uint8)
+        seq[0] += 1    # even: slot is complete
+        self.ring.head[0] = head + 1
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                conn = self.listener.accept()
+            except Exception:
+                break
+            if self._closed:
+                conn.close()
+                break
+            threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+
+    def _serve_client(self, conn):
+        subscribed = False
+        try:
+            while not self._closed:
+                request = conn.recv()
+                if request == "subscribe":
+                    if not subscribed:
+                        subscribed = True
+                        with self._lock:
+                            self.subscribers += 1
+                    conn.send(self.layout())
+                elif request == "stats":
+                    conn.send(self.stats())
+                elif request == "unsubscribe":
+                    break
+                else:
+                    conn.send({"error": f"unknown request: {request!r}"})
+        except (EOFError, OSError):
+            pass
+        finally:
+            if subscribed:
+                with self._lock:
+                    self.subscribers -= 1
+            conn.close()
+
+    def stats(self):
+        return {
+            "frames_published": self.frames_published,
+            "frames_skipped": self.frames_skipped,
+            "subscribers": self.subscribers,
+        }
+
+    def close(self):
+        """Stop the control socket and remove the shared memory segment"""
+        with self._publish_lock:
+            if self._closed:
+                return
+            self._closed = True
+            # Tell subscribers this ring is finished before it goes away
+            self.ring.closed[0] = 1
+
+        # Wake up the accept loop so the listener can be closed
+        try:
+            Client(self.address).close()
+        except Exception:
+            pass
+        try:
+            self.listener.close()
+        except Exception as e:
+            print(f"Error closing frame server socket: {e}")
+
+        self.ring.release()
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except Exception as e:
+            print(f"Error releasing frame server memory: {e}")
+        print(f"Frame server '{self.name}' stopped after {self.frames_published} frames")
+
+
+class FrameClient:
+    """Subscribes to a FrameServer and reads frames as zero-copy NumPy views"""
+
+    def __init__(self, name=DEFAULT_NAME):
+        self.conn = Client(control_address(name))
+        self.conn.send("subscribe")
+        layout = self.conn.recv()
+        self.shm = _attach_shared_memory(layout["shm_name"])
+        magic, version, slot_count, slot_bytes = GLOBAL_HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("Shared memory segment is not a compatible frame ring")
+        self.ring = _FrameRing(self.shm, slot_count, slot_bytes)
+        self.frames_dropped = 0
+        # Start from the newest frame rather than replaying the whole ring
+        self.cursor = int(self.ring.head[0])
+
+    def _read_slot(self, index):
+        """Return the frame published as number `index`, or None if it was overwritten"""
+        slot = index % self.ring.slot_count
+        seq = int(self.ring.seqs[slot][0])
+        # Each publish advances a slot's sequence by 2, so the expected value
+        # after the writer has filled this slot for `index` is known exactly
+        if seq != 2 * (index // self.ring.slot_count + 1):
+            return None
+        frame_index, pts, height, width, channels, dtype = SLOT_META.unpack_from(self.ring.metas[slot], 0)
+        dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        shape = (height, width, channels) if channels else (height, width)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        array = self.ring.data[slot][:nbytes].view(dtype).reshape(shape)
+        if int(self.ring.seqs[slot][0]) != seq:
+            return None
+        return Frame(self.ring, slot, seq, frame_index, pts, array)
+
+    @property
+    def closed(self):
+        """True once the server has closed the ring this client is attached to"""
+        return bool(self.ring.closed[0])
+
+    def latest(self):
+        """Return the most recently published frame, or None if there is none yet
+
+        Raises FrameServerClosed if the server has closed the ring.
+        """
+        if self.closed:
+            raise FrameServerClosed(f"Frame ring {self.shm.name} was closed")
+        head = int(self.ring.head[0])
+        if head == 0:
+            return None
+        return self._read_slot(head - 1)
+
+    def next_frame(self, timeout=None, poll_interval=0.001):
+        """Return the next unread frame, skipping any the writer has already lapped
+
+        Returns None on timeout. Raises FrameServerClosed once the server has closed
+        the ring and every frame still in it has been read.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            head = int(self.ring.head[0])
+            if head - self.cursor > self.ring.slot_count:
+                # Fell a whole ring behind, jump to the oldest slot still intact
+                skipped = head - self.ring.slot_count - self.cursor
+                self.frames_dropped += skipped
+                self.cursor += skipped
+            if self.cursor < head:
+                frame = self._read_slot(self.cursor)
+                self.cursor += 1
+                if frame is not None:
+                    return frame
+                self.frames_dropped += 1
+                continue
+            if self.closed:
+                raise FrameServerClosed(f"Frame ring {self.shm.name} was closed")
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def frames(self, timeout=None):
+        """Iterate over frames until none arrive within `timeout` seconds
+
+        Raises FrameServerClosed when the server closes the ring.
+        """
+        while True:
+            frame = self.next_frame(timeout)
+            if frame is None:
+                return
+            yield frame
+
+    def stats(self):
+        self.conn.send("stats")
+        return self.conn.recv()
+
+    def close(self):
+        try:
+            self.conn.send("unsubscribe")
+        except Exception:
+            pass
+        self.conn.close()
+        if hasattr(self, "ring"):
+            self.ring.release()
+        try:
+            self.shm.close()
+        except BufferError:
+            # A caller is still holding a frame view; the mapping goes away with the process
+            pass
+
+
+def _bench_consumer(name, results):
+    client = FrameClient(name)
+    received = 0
+    torn = 0
+    first = last = None
+    try:
+        while True:
+            frame = client.next_frame()
+            # Read every pixel, the way an analysis job would
+            frame.array.sum()
+            if not frame.valid():
+                torn += 1
+            last = time.perf_counter()
+            if first is None:
+                first = last
+            received += 1
+    except FrameServerClosed:
+        pass
+    # Time from the first frame to the last, excluding startup and shutdown
+    elapsed = (last - first) if received > 1 else 0.0
+    results.put((os.getpid(), received, client.frames_dropped, torn, elapsed))
+    client.close()
+
+
+def benchmark(subscribers=4, frames=600, width=1920, height=1080, fps=0, slot_count=DEFAULT_SLOTS,
+              startup_timeout=10.0):
+    """Measure publish cost and per-subscriber throughput with several consumer processes"""
+    import multiprocessing as mp
+
+    name = f"{DEFAULT_NAME}_bench_{os.getpid()}"
+    server = FrameServer((height, width, 3), slot_count=slot_count, name=name)
+    results = mp.Queue()
+    workers = [mp.Process(target=_bench_consumer, args=(name, results)) for _ in range(subscribers)]
+    for w in workers:
+        w.start()
+    deadline = time.time() + startup_timeout
+    while server.subscribers < subscribers:
+        if time.time() > deadline:
+            for w in workers:
+                w.terminate()
+            server.close()
+            raise RuntimeError(f"Only {server.subscribers} of {subscribers} subscribers connected")
+        time.sleep(0.01)
+
+    source = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+    publish_times = []
+    interval = 1.0 / fps if fps > 0 else 0
+    start = time.time()
+    for i in range(frames):
+        t0 = time.perf_counter()
+        server.publish(source, i, i * interval)
+        publish_times.append(time.perf_counter() - t0)
+        if interval:
+            delay = start + (i + 1) * interval - time.time()
+            if delay > 0:
+                time.sleep(delay)
+    total = time.time() - start
+
+    # Closing the ring lets subscribers drain what is left and exit
+    server.close()
+    stats = [results.get(timeout=30) for _ in workers]
+    for w in workers:
+        w.join()
+
+    publish_times = np.array(publish_times) * 1000
+    frame_mb = width * height * 3 / (1024 * 1024)
+    print(f"\n=== Frame server benchmark: {width}x{height}, {subscribers} subscribers, {slot_count} slots ===")
+    print(f"Published {frames} frames in {total:.2f}s ({frames / total:.1f} fps, {frames * frame_mb / total:.0f} MB/s)")
+    print(f"Publish time: mean {publish_times.mean():.3f} ms, "
+          f"p99 {np.percentile(publish_times, 99):.3f} ms, max {publish_times.max():.3f} ms")
+    for pid, received, dropped, torn, elapsed in stats:
+        rate = (received - 1) / elapsed if elapsed > 0 else 0.0
+        print(f"  subscriber {pid}: {received} frames, {dropped} dropped, {torn} overwritten while reading, "
+              f"{rate:.1f} fps ({rate * frame_mb:.0f} MB/s)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the shared memory frame server")
+    parser.add_argument("--subscribers", type=int, default=4)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--size", default="1920x1080", help="frame size as WIDTHxHEIGHT")
+    parser.add_argument("--fps", type=float, default=0, help="pace publishing at this rate (0 = as fast as possible)")
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS)
+    args = parser.parse_args()
+
+    bench_width, bench_height = (int(v) for v in args.size.lower().split("x"))
+    benchmark(args.subscribers, args.frames, bench_width, bench_height, args.fps, args.slots)
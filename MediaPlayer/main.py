@@ -10,6 +10,8 @@ import platform
 from moviepy import VideoFileClip
 import tempfile
 import numpy as np
+from frame_server import FrameServer
+from scene_index import SceneAnalyzer, load_scene_index
 # from moviepy.audio.fx import speedx 
 
 class ImprovedMediaPlayer:
@@ -34,6 +36,10 @@ class ImprovedMediaPlayer:
         self.file_path = None
         self.current_position = 0
         self.temp_audio_file = None
+        self.frame_server = None
+        self.scene_analyzer = None
+        self.scene_index = None
+        self.last_late_frame = 0.0
         
         # Get screen dimensions
         self.screen_width = root.winfo_screenwidth()
@@ -216,6 +222,11 @@ class ImprovedMediaPlayer:
         tools_menu = tk.Menu(menubar, tearoff=0)
         tools_menu.add_command(label="Check FFmpeg", command=self.ensure_ffmpeg)
         tools_menu.add_command(label="FFmpeg Installation Help", command=self.show_ffmpeg_instructions)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Scene Index", command=self.show_scene_index)
+        self.publish_frames = tk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label="Publish Frames (Shared Memory)", variable=self.publish_frames,
+                                   command=self.toggle_frame_server)
         menubar.add_cascade(label="Tools", menu=tools_menu)
         
         self.root.config(menu=menubar)
@@ -323,6 +334,12 @@ class ImprovedMediaPlayer:
             # Reset position
             self.current_position = 0
             
+            # Size the shared memory ring for this file's frames
+            self.start_frame_server()
+            
+            # Index scenes in the background (or load a cached index)
+            self.start_scene_analysis(file_path)
+            
         except Exception as e:
             messagebox.showerror("Error", f"Could not initialize media: {str(e)}")
             return False
@@ -439,6 +456,11 @@ class ImprovedMediaPlayer:
                 else:
                     break
                 
+                # Publish the full-size BGR frame for other processes
+                server = self.frame_server
+                if server:
+                    server.publish(frame, int(elapsed * self.fps), elapsed)
+                
                 # Resize frame while maintaining aspect ratio and scale
                 current_width = self.canvas.winfo_width()
                 current_height = self.canvas.winfo_height()
@@ -456,6 +478,9 @@ class ImprovedMediaPlayer:
                 delay = next_frame_time - time.time()
                 if delay > 0:
                     time.sleep(delay)
+                else:
+                    # Falling behind, let background work back off
+                    self.last_late_frame = time.time()
 
             # End of playback
             if not self.stop_event.is_set():
@@ -599,8 +624,110 @@ class ImprovedMediaPlayer:
             pygame.mixer.music.stop()
             self.sound = False
             
+        self.stop_frame_server()
+        self.stop_scene_analysis()
         self.cleanup_temp_files()
 
+    def toggle_frame_server(self):
+        """Start or stop publishing decoded frames to shared memory"""
+        if self.publish_frames.get():
+            self.start_frame_server()
+        else:
+            self.stop_frame_server()
+
+    def start_frame_server(self):
+        """Create a frame server sized for the current video, if publishing is enabled"""
+        if not self.publish_frames.get() or not (self.vid or self.clip):
+            return
+        self.stop_frame_server()
+        try:
+            self.frame_server = FrameServer((self.original_height, self.original_width, 3))
+        except Exception as e:
+            print(f"Frame server error: {e}")
+            self.publish_frames.set(False)
+            messagebox.showerror("Frame Server", f"Could not start frame server: {e}")
+
+    def stop_frame_server(self):
+        if self.frame_server:
+            server = self.frame_server
+            self.frame_server = None
+            server.close()
+
+    def start_scene_analysis(self, file_path):
+        """Load the cached scene index for a video or start building one"""
+        self.stop_scene_analysis()
+        self.scene_index = None
+        if not (self.vid or self.clip):
+            return
+        
+        self.scene_index = load_scene_index(file_path)
+        if self.scene_index is not None:
+            print(f"Loaded cached scene index from {self.scene_index['cache_dir']}")
+            return
+        
+        def on_complete(index):
+            self.root.after(0, self.set_scene_index, analyzer, index)
+        
+        analyzer = SceneAnalyzer(file_path, on_complete=on_complete, yield_to=self.playback_needs_cpu)
+        self.scene_analyzer = analyzer
+        analyzer.start()
+
+    def playback_needs_cpu(self):
+        """True while playback has recently fallen behind and background work should back off"""
+        return self.playing and not self.paused and time.time() - self.last_late_frame < 2.0
+
+    def stop_scene_analysis(self, timeout=None):
+        if self.scene_analyzer:
+            self.scene_analyzer.stop(timeout)
+            self.scene_analyzer = None
+
+    def set_scene_index(self, analyzer, index):
+        # Ignore results from an analyzer that has since been stopped or replaced,
+        # even one for the same file
+        if analyzer is self.scene_analyzer:
+            self.scene_index = index
+            self.scene_analyzer = None
+
+    def show_scene_index(self):
+        """Show the scene cuts and their thumbnails for the current video"""
+        if self.scene_index is None:
+            if self.scene_analyzer:
+                messagebox.showinfo("Scene Index", f"Analyzing scenes... {self.scene_analyzer.progress * 100:.0f}%")
+            else:
+                messagebox.showinfo("Scene Index", "No scene index available")
+            return
+        
+        scene_win = tk.Toplevel(self.root)
+        scene_win.title("Scene Index")
+        scene_win.geometry("480x600")
+        scene_win.transient(self.root)
+        text = tk.Text(scene_win, wrap=tk.WORD, padx=10, pady=10)
+        scrollbar = ttk.Scrollbar(scene_win, command=text.yview)
+        text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        def format_time(seconds):
+            minutes, seconds = divmod(int(seconds), 60)
+            hours, minutes = divmod(minutes, 60)
+            return f"{hours}:{minutes:02d}:{seconds:02d}"
+        
+        scenes = self.scene_index["scenes"]
+        thumb_dir = self.scene_index.get("cache_dir")
+        text.insert(tk.END, f"=== {len(scenes)} Scenes ===\n\n")
+        text.images = []  # Keep references to prevent garbage collection
+        for i, scene in enumerate(scenes):
+            if scene["thumbnail"] and thumb_dir:
+                thumb = cv2.imread(os.path.join(thumb_dir, scene["thumbnail"]))
+                if thumb is not None:
+                    # The PPM encoder already writes BGR images out as RGB
+                    img = tk.PhotoImage(data=cv2.imencode('.ppm', thumb)[1].tobytes())
+                    text.images.append(img)
+                    text.image_create(tk.END, image=img)
+                    text.insert(tk.END, "  ")
+            text.insert(tk.END, f"Scene {i + 1}: {format_time(scene['start'])} - {format_time(scene['end'])}\n\n")
+        text.config(state=tk.DISABLED)
+
     def show_metadata(self):
         if not (self.vid or self.clip) and not self.file_path:
             messagebox.showinfo("Metadata", "No media file loaded")
@@ -638,6 +765,12 @@ class ImprovedMediaPlayer:
             else:
                 metadata["Audio Playback"] = "Not available"
             
+            # Add scene analysis info
+            if self.scene_index is not None:
+                metadata["Scenes"] = len(self.scene_index["scenes"])
+            elif self.scene_analyzer:
+                metadata["Scenes"] = f"Analyzing ({self.scene_analyzer.progress * 100:.0f}%)"
+            
             meta_win = tk.Toplevel(self.root)
             meta_win.title("Media Metadata")
             meta_win.geometry("400x300")
@@ -669,6 +802,9 @@ class ImprovedMediaPlayer:
             return "Unknown"
 
     def on_close(self):
+        # Let scene analysis clean up its scratch files before the process exits
+        self.stop_scene_analysis(timeout=5)
+        
         # Stop media playback
         self.stop_media()
         
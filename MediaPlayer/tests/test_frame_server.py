@@ -0,0 +1,116 @@
+import os
+import sys
+import threading
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import frame_server
+from frame_server import FrameServer, FrameClient, FrameServerClosed
+
+SHAPE = (4, 6, 3)
+
+
+def make_frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+@pytest.fixture
+def server():
+    server = FrameServer(SHAPE, slot_count=4, name=f"mmc_frames_test_{os.getpid()}")
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def client(server):
+    client = FrameClient(server.name)
+    yield client
+    client.close()
+
+
+def test_publish_and_read_round_trip(server, client):
+    assert server.publish(make_frame(7), 42, 1.5)
+
+    frame = client.next_frame(timeout=1)
+    assert frame.frame_index == 42
+    assert frame.pts == 1.5
+    assert frame.array.shape == SHAPE
+    assert frame.array.dtype == np.uint8
+    assert (frame.array == 7).all()
+    assert frame.valid()
+    assert client.next_frame(timeout=0.01) is None
+    assert server.stats()["subscribers"] == 1
+
+
+def test_lapped_client_skips_to_oldest_intact_frame(server, client):
+    server.publish(make_frame(0), 0, 0.0)
+    first = client.next_frame(timeout=1)
+    for i in range(1, 10):
+        server.publish(make_frame(i), i, i / 30)
+
+    # Frame 0's slot has been reused, and frames 1-5 were lapped
+    assert not first.valid()
+    assert [client.next_frame(timeout=1).frame_index for _ in range(4)] == [6, 7, 8, 9]
+    assert client.frames_dropped == 5
+
+
+def test_read_slot_rejects_overwritten_frame(server, client):
+    for i in range(5):
+        server.publish(make_frame(i), i, 0.0)
+
+    # Frame 0 and frame 4 share slot 0, only the newer one can be read
+    assert client._read_slot(0) is None
+    assert client._read_slot(4).frame_index == 4
+    assert client.latest().frame_index == 4
+
+
+def test_oversized_frame_is_skipped(server, client):
+    assert not server.publish(np.zeros((8, 8, 3), dtype=np.uint8), 0, 0.0)
+    assert server.frames_skipped == 1
+    assert client.latest() is None
+
+
+def test_close_drains_then_raises(server, client):
+    server.publish(make_frame(1), 1, 0.0)
+    server.publish(make_frame(2), 2, 0.0)
+    server.close()
+
+    assert [client.next_frame().frame_index for _ in range(2)] == [1, 2]
+    with pytest.raises(FrameServerClosed):
+        client.next_frame()
+    with pytest.raises(FrameServerClosed):
+        client.latest()
+
+
+def test_second_server_with_same_name_is_refused(server, client):
+    with pytest.raises(RuntimeError):
+        FrameServer(SHAPE, name=server.name)
+
+    # The first server keeps working
+    server.publish(make_frame(3), 3, 0.0)
+    assert client.next_frame(timeout=1).frame_index == 3
+
+
+def test_concurrent_attaches_restore_resource_tracker(server):
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    shm_name = server.shm.name
+
+    def attach():
+        for _ in range(200):
+            frame_server._attach_shared_memory(shm_name).close()
+
+    # Switch threads often so unguarded patches would interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=attach) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert resource_tracker.register is register
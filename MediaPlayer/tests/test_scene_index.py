@@ -0,0 +1,142 @@
+import os
+import time
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+import scene_index
+from scene_index import HIST_BITS, HIST_BINS, SceneAnalyzer, load_scene_index, score_batch
+
+
+def reference_hist(frame):
+    q = (frame >> (8 - HIST_BITS)).astype(np.intp)
+    codes = (q[..., 0] << (2 * HIST_BITS)) | (q[..., 1] << HIST_BITS) | q[..., 2]
+    return np.bincount(codes.ravel(), minlength=HIST_BINS) / codes.size
+
+
+def solid(color, shape=(18, 32)):
+    frame = np.empty(shape + (3,), dtype=np.uint8)
+    frame[...] = color
+    return frame
+
+
+def test_batched_histograms_match_per_frame_histograms():
+    rng = np.random.default_rng(0)
+    batch = rng.integers(0, 256, (5, 18, 32, 3), dtype=np.uint8)
+    batch[3] = batch[2]
+
+    hist_dist, pixel_diff, _, last_hist, _ = score_batch(batch)
+
+    hists = [reference_hist(frame) for frame in batch]
+    expected = [0.0] + [0.5 * np.abs(hists[i] - hists[i - 1]).sum() for i in range(1, 5)]
+    np.testing.assert_allclose(hist_dist, expected, atol=1e-6)
+    np.testing.assert_allclose(last_hist, hists[-1], atol=1e-6)
+    assert pixel_diff[0] == 0 and pixel_diff[3] == 0
+
+
+def test_previous_frame_carries_across_batches():
+    rng = np.random.default_rng(1)
+    batch = rng.integers(0, 256, (6, 18, 32, 3), dtype=np.uint8)
+
+    whole = score_batch(batch)
+    head = score_batch(batch[:2])
+    tail = score_batch(batch[2:], head[3], head[4])
+
+    for i in range(3):
+        np.testing.assert_allclose(np.concatenate([head[i], tail[i]]), whole[i], atol=1e-5)
+
+
+def test_solid_colour_change_is_a_full_histogram_change():
+    batch = np.stack([solid((0, 0, 255)), solid((0, 0, 255)), solid((255, 0, 0))])
+    hist_dist, _, _, _, _ = score_batch(batch)
+    np.testing.assert_allclose(hist_dist, [0.0, 0.0, 1.0])
+
+
+def feed(state, frames, start_time, batch_size=16):
+    """Run frames through the cut detector in batches, 0.2s apart"""
+    for i in range(0, len(frames), batch_size):
+        chunk = np.stack(frames[i:i + batch_size])
+        times = start_time + 0.2 * np.arange(i, i + len(chunk))
+        state.process(chunk, chunk, times, len(chunk))
+
+
+def noisy_scene(color, count, rng):
+    base = solid(color).astype(np.int16)
+    return [np.clip(base + rng.integers(-6, 7, base.shape), 0, 255).astype(np.uint8) for _ in range(count)]
+
+
+def test_cut_detection_finds_scene_changes():
+    rng = np.random.default_rng(2)
+    frames = (noisy_scene((40, 120, 200), 25, rng) +
+              noisy_scene((200, 60, 30), 20, rng) +
+              noisy_scene((90, 200, 90), 30, rng))
+    state = scene_index._CutState(SceneAnalyzer("unused"), None)
+    feed(state, frames, 0.0)
+    state.close_scene(0.2 * len(frames))
+
+    assert [round(s["start"], 1) for s in state.scenes] == [0.0, 5.0, 9.0]
+    assert state.scenes[-1]["end"] == pytest.approx(15.0)
+    # Without a cache directory no thumbnails are written
+    assert all(s["thumbnail"] is None for s in state.scenes)
+
+
+def test_noise_within_a_scene_is_not_a_cut():
+    rng = np.random.default_rng(3)
+    state = scene_index._CutState(SceneAnalyzer("unused"), None)
+    feed(state, noisy_scene((128, 128, 128), 60, rng), 0.0)
+    state.close_scene(12.0)
+    assert len(state.scenes) == 1
+
+
+def test_analyze_caches_index_beside_media(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 36))
+    for color, seconds in [((0, 0, 255), 3), ((0, 255, 0), 3), ((255, 0, 0), 3)]:
+        for _ in range(seconds * 10):
+            writer.write(solid(color, (36, 64)))
+    writer.release()
+
+    index = SceneAnalyzer(path).analyze()
+    assert [round(s["start"]) for s in index["scenes"]] == [0, 3, 6]
+    assert index["cache_dir"] == f"{path}.scenes"
+    assert (tmp_path / "clip.avi.scenes" / index["scenes"][0]["thumbnail"]).exists()
+
+    cached = load_scene_index(path)
+    assert cached["scenes"] == index["scenes"]
+    # Only the finished cache directory is left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["clip.avi", "clip.avi.scenes"]
+
+
+def write_clip(path, seconds=3, fps=10):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (64, 36))
+    for i in range(seconds * fps):
+        writer.write(solid((i * 8 % 256, 0, 255), (36, 64)))
+    writer.release()
+
+
+def test_stale_scratch_directories_are_removed(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    write_clip(path)
+    stale = tmp_path / ".clip.avi.scenes-stale"
+    recent = tmp_path / ".clip.avi.scenes-recent"
+    stale.mkdir()
+    recent.mkdir()
+    old = time.time() - scene_index.STALE_WORK_DIR_SECONDS - 60
+    os.utime(stale, (old, old))
+
+    SceneAnalyzer(path).analyze()
+
+    # A recent directory may belong to a run in another process
+    assert not stale.exists()
+    assert recent.exists()
+
+
+def test_stop_waits_for_scratch_cleanup(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    write_clip(path, seconds=30)
+    analyzer = SceneAnalyzer(path, yield_to=lambda: True)
+    analyzer.start()
+    assert analyzer.stop(timeout=5)
+    assert analyzer.index is None
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["clip.avi"]